@@ -28,7 +28,7 @@ def index(args: argparse.Namespace):
     )
 
     # if compressed, create GZI index
-    with open(args.path, "rb") as FASTA:
+    with open(args.path, "rb", buffering=compression.READ_BUFFER_SIZE) as FASTA:
         try:
             compression_format = compression._detect_format(FASTA)
             if compression_format is Compression.GZIP:
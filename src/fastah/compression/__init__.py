@@ -1,10 +1,12 @@
 import gzip
 from enum import Enum
-from io import BufferedIOBase
+from io import SEEK_CUR, BufferedIOBase, BufferedReader, RawIOBase
 from typing import Optional
 
 from . import _bgzf, _zstd
 
+READ_BUFFER_SIZE = 128 * 1024
+
 
 class Compression(Enum):
     AUTO = "auto"
@@ -21,36 +23,41 @@ def _format_enabled(compression: Compression) -> bool:
     return True
 
 
-def _is_format(source: BufferedIOBase, compression: Compression) -> bool:
+def _read_chunk(
+    source: BufferedIOBase, compression: Compression, count: int = 1
+) -> bytes:
     if compression is Compression.BGZF:
-        return _bgzf.is_bgzf(source)
-    elif compression is Compression.GZIP:
-        return _bgzf.is_gzip(source)
+        if count == 1:
+            return _bgzf._read_block(source)
+        return b"".join(_bgzf.read_block_range(source, source.tell(), count))
     elif compression is Compression.ZSTD:
-        return _zstd.is_zstd(source)
+        return b"".join(_zstd._read_frame(source) for _ in range(count))
+
+    raise ValueError(f"Cannot read a chunk from compression type '{compression}'")
 
 
-def _read_chunk(source: BufferedIOBase, compression: Compression) -> bytes:
+def _decompress_each(sources: list[bytes], compression: Compression) -> list[bytes]:
     if compression is Compression.BGZF:
-        return _bgzf._read_block(source)
+        return _bgzf.decompress_each(sources)
     elif compression is Compression.ZSTD:
-        return _zstd._read_frame(source)
+        return [_zstd._decompress(source) for source in sources]
 
-    raise ValueError(f"Cannot read a chunk from compression type '{compression}'")
+    raise ValueError(f"Cannot decompress from compression type '{compression}'")
 
 
-def _decompress(source: bytes, compression: Compression) -> bytes:
-    if (compression is Compression.GZIP) or (compression is Compression.BGZF):
-        return gzip.decompress(source)
-    elif compression is Compression.ZSTD:
-        return _zstd._decompress(source)
+def _buffered(source: BufferedIOBase) -> BufferedIOBase:
+    # only unbuffered streams are wrapped, since a new buffer would read ahead
+    # of the position the caller sees in an already buffered stream
+    if isinstance(source, RawIOBase):
+        return BufferedReader(source, buffer_size=READ_BUFFER_SIZE)
 
-    raise ValueError(f"Cannot decompress from compression type '{compression}'")
+    return source
 
 
 def _index(
     source: BufferedIOBase, destination: BufferedIOBase, compression: Compression
 ) -> None:
+    source = _buffered(source)
     if compression is Compression.BGZF:
         return _bgzf.index(source, destination)
     elif compression is Compression.ZSTD:
@@ -60,27 +67,31 @@ def _index(
 
 
 def _detect_format(source: BufferedIOBase):
-    if _bgzf.is_bgzf(source):
+    # the BGZF header is the longest magic number, so one read covers them all
+    header = source.read(len(_bgzf.BGZF_HEADER))
+    # reset the offset
+    source.seek(-len(header), SEEK_CUR)
+
+    if _bgzf._is_bgzf_header(header):
         return Compression.BGZF
-    elif _bgzf.is_gzip(source):
+    elif _bgzf._is_gzip_header(header):
         return Compression.GZIP
-    elif _zstd.is_zstd(source):
+    elif _format_enabled(Compression.ZSTD) and _zstd._is_zstd_header(header):
         return Compression.ZSTD
 
     raise RuntimeError("Failed to detect compression type from source")
 
 
-def _get_line_iterator(
+def _get_reader(
     source: BufferedIOBase, compression: Optional[Compression] = None
-):
+) -> BufferedIOBase:
+    source = _buffered(source)
     if compression is None:
         compression = _detect_format(source)
 
     if (compression is Compression.GZIP) or (compression is Compression.BGZF):
-        return gzip.open(source, mode="rt")
+        return gzip.open(source, mode="rb")
     elif compression is Compression.ZSTD:
-        return _zstd._get_line_iterator(source)
+        return _zstd._get_reader(source, buffer_size=READ_BUFFER_SIZE)
 
-    raise ValueError(
-        f"Cannot create line iterator from compression type '{compression}'"
-    )
+    raise ValueError(f"Cannot create reader from compression type '{compression}'")
@@ -1,9 +1,25 @@
 import logging
+import mmap
+import os
 import struct
+import threading
 import zlib
-from collections import namedtuple
-from io import BufferedIOBase
-from typing import Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import SEEK_CUR, BufferedIOBase
+from typing import Generator, Optional
+
+from . import _gzi
+
+try:
+    import deflate
+    from deflate import crc32 as _crc32
+
+    _HAS_DEFLATE = True
+except ModuleNotFoundError:
+    from zlib import crc32 as _crc32
+
+    _HAS_DEFLATE = False
 
 MAX_BLOCK_SIZE_IN_BYTES = 65_536
 # solved for source_len using
@@ -15,18 +31,51 @@ GZIP_HEADER = b"\x1f\x8b"
 BGZF_HEADER = b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00"
 BGZF_HEADER_STRUCT_FORMAT = "<BBBBLBBHBBHH"
 BGZF_TAILER_STRUCT_FORMAT = "<LL"
+BGZF_HEADER_STRUCT = struct.Struct(BGZF_HEADER_STRUCT_FORMAT)
+BGZF_TAILER_STRUCT = struct.Struct(BGZF_TAILER_STRUCT_FORMAT)
+BSIZE_STRUCT = struct.Struct("<H")
+DEFLATE_COMPRESSION_LEVEL = 6
+
+
+def _deflate(content: bytes) -> tuple[bytes, int]:
+    """Compresses content into a raw deflate stream, also returning its CRC32."""
+
+    # the empty EOF marker block is left to zlib so it matches the canonical
+    # 28 byte block other BGZF readers look for
+    if _HAS_DEFLATE and content:
+        compressed = deflate.deflate_compress(content, DEFLATE_COMPRESSION_LEVEL)
+    else:
+        compressor = zlib.compressobj(
+            level=DEFLATE_COMPRESSION_LEVEL, wbits=-15, memLevel=8
+        )
+        compressed = compressor.compress(content)
+        compressed += compressor.flush(zlib.Z_FINISH)
 
+    return compressed, _crc32(content)
 
-def _write_bgzf_block(destination: BufferedIOBase, content: bytes):
+
+def _inflate(payload: bytes, uncompressed_size: int) -> bytes:
+    """Decompresses a raw deflate stream with a known uncompressed size."""
+
+    if _HAS_DEFLATE:
+        try:
+            return deflate.deflate_decompress(payload, uncompressed_size)
+        except deflate.DeflateError:
+            # the size from the block metadata may be wrong; let zlib try so
+            # the caller can report the mismatch
+            pass
+
+    return zlib.decompress(payload, wbits=-zlib.MAX_WBITS)
+
+
+def _compress_block(content: bytes) -> bytearray:
     if len(content) > UNCOMPRESSED_BLOCK_DATA_BOUND_IN_BYTES:
         raise ValueError(
             "Attempting to compress too much data into a single BGZF block"
         )
 
     # compress the source bytes
-    compressor = zlib.compressobj(wbits=-15, memLevel=8)
-    compressed = compressor.compress(content)
-    compressed += compressor.flush(zlib.Z_FINISH)
+    compressed, crc32 = _deflate(content)
     bsize = len(compressed) + 25
 
     if bsize >= MAX_BLOCK_SIZE_IN_BYTES:
@@ -34,86 +83,250 @@ def _write_bgzf_block(destination: BufferedIOBase, content: bytes):
             "Data compressed too large to be fit into a single BGZF block"
         )
 
-    # write ID1, ID2, CM, FLG, MTIME, XFL, OS, XLEN, SI1, SI2, SLEN
-    destination.write(BGZF_HEADER)
-    # write BSIZE
-    destination.write(struct.pack("<H", bsize))
-    # write CDATA
-    destination.write(compressed)
-    # write CRC32 and ISIZE
-    destination.write(
-        struct.pack(BGZF_TAILER_STRUCT_FORMAT, zlib.crc32(content), len(content))
+    # frame the block in one exactly sized buffer rather than joining
+    # separately packed fields
+    block = bytearray(bsize + 1)
+    # ID1, ID2, CM, FLG, MTIME, XFL, OS, XLEN, SI1, SI2, SLEN
+    block[: len(BGZF_HEADER)] = BGZF_HEADER
+    # BSIZE
+    BSIZE_STRUCT.pack_into(block, len(BGZF_HEADER), bsize)
+    # CDATA
+    block[len(BGZF_HEADER) + BSIZE_STRUCT.size : -BGZF_TAILER_STRUCT.size] = compressed
+    # CRC32 and ISIZE
+    BGZF_TAILER_STRUCT.pack_into(
+        block, len(block) - BGZF_TAILER_STRUCT.size, crc32, len(content)
     )
 
+    return block
 
-def compress(source: BufferedIOBase, destination: BufferedIOBase):
-    block = source.read(UNCOMPRESSED_BLOCK_DATA_BOUND_IN_BYTES)
-    while block:
-        # try to split blocks on newlines if possible
-        newline_idx = block.rfind(b"\n")
-
-        if newline_idx >= 0:
-            remainder = block[newline_idx + 1 :]
-            block = block[: newline_idx + 1]
-        _write_bgzf_block(destination, block)
 
-        block = remainder + source.read(
-            UNCOMPRESSED_BLOCK_DATA_BOUND_IN_BYTES - len(remainder)
-        )
-        remainder = b""
+def _write_bgzf_block(destination: BufferedIOBase, content: bytes):
+    destination.write(_compress_block(content))
+
+
+def _split_blocks(
+    source: BufferedIOBase, block_size: int = UNCOMPRESSED_BLOCK_DATA_BOUND_IN_BYTES
+) -> Generator[bytes, None, None]:
+    # read into one reusable buffer rather than allocating and slicing new
+    # bytes objects for every block
+    buffer = bytearray(block_size)
+    view = memoryview(buffer)
+    remainder_length = 0
+    while True:
+        block_length = remainder_length
+        while block_length < len(buffer):
+            bytes_read = source.readinto(view[block_length:])
+            if not bytes_read:
+                break
+            block_length += bytes_read
+
+        if not block_length:
+            return
+
+        split_idx = block_length
+        if block_length == len(buffer):
+            # try to split full blocks on newlines if possible
+            newline_idx = buffer.rfind(b"\n", 0, block_length)
+            if newline_idx >= 0:
+                split_idx = newline_idx + 1
+        # the block is copied out since it may be compressed while the buffer
+        # is being refilled
+        yield bytes(view[:split_idx])
+
+        # move the remainder to the start of the buffer
+        remainder_length = block_length - split_idx
+        view[:remainder_length] = view[split_idx:block_length]
+
+
+def compress(
+    source: BufferedIOBase, destination: BufferedIOBase, threads: Optional[int] = None
+):
+    if threads is None:
+        threads = os.cpu_count() or 1
+
+    if threads > 1:
+        # deflate releases the GIL, so blocks can be compressed concurrently
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            pending = deque()
+            for block in _split_blocks(source):
+                pending.append(executor.submit(_compress_block, block))
+                # limit the number of blocks held in memory at once
+                if len(pending) >= (2 * threads):
+                    destination.write(pending.popleft().result())
+
+            # write blocks in the order they were read
+            while pending:
+                destination.write(pending.popleft().result())
+    else:
+        for block in _split_blocks(source):
+            _write_bgzf_block(destination, block)
 
     # write EOF marker block
     _write_bgzf_block(destination, b"")
 
 
-BGZFHeader = namedtuple(
-    "BGZFHeader",
-    [
-        "ID1",
-        "ID2",
-        "CM",
-        "FLG",
-        "MTIME",
-        "XFL",
-        "OS",
-        "XLEN",
-        "SI1",
-        "SI2",
-        "SLEN",
-        "BSIZE",
-    ],
-)
-BGZFTailer = namedtuple("BGZFTailer", ["CRC32", "ISIZE"])
+# blocks are read into a buffer owned by each thread, so the only allocation
+# per block is the copy of its compressed payload
+_thread_local = threading.local()
 
 
-def _read_block(source: BufferedIOBase) -> bytes:
-    block_header_length = struct.calcsize(BGZF_HEADER_STRUCT_FORMAT)
-    block_tailer_length = struct.calcsize(BGZF_TAILER_STRUCT_FORMAT)
+def _get_read_buffer() -> memoryview:
+    try:
+        return _thread_local.read_buffer
+    except AttributeError:
+        _thread_local.read_buffer = memoryview(bytearray(MAX_BLOCK_SIZE_IN_BYTES))
+        return _thread_local.read_buffer
 
-    block_header = BGZFHeader(
-        *struct.unpack(BGZF_HEADER_STRUCT_FORMAT, source.read(block_header_length))
-    )
-    block_remainder = source.read(block_header.BSIZE + 1 - block_header_length)
-    payload_compressed, block_tailer = block_remainder[
-        :-block_tailer_length
-    ], BGZFTailer(
-        *struct.unpack(
-            BGZF_TAILER_STRUCT_FORMAT, block_remainder[-block_tailer_length:]
-        )
-    )
-    payload = zlib.decompress(payload_compressed, wbits=-zlib.MAX_WBITS)
 
-    if zlib.crc32(payload) != block_tailer.CRC32:
+def _read_raw_block(source: BufferedIOBase) -> Optional[tuple[bytes, int, int]]:
+    block_header_length = BGZF_HEADER_STRUCT.size
+    block_tailer_length = BGZF_TAILER_STRUCT.size
+
+    block_header = source.read(block_header_length)
+    if not block_header:
+        # reached the end of the stream
+        return None
+
+    # only BSIZE, the last header field, is needed
+    bsize = BGZF_HEADER_STRUCT.unpack(block_header)[-1]
+    block_remainder = _get_read_buffer()[: bsize + 1 - block_header_length]
+    payload_length = source.readinto(block_remainder) - block_tailer_length
+    crc32, isize = BGZF_TAILER_STRUCT.unpack_from(block_remainder, payload_length)
+
+    return bytes(block_remainder[:payload_length]), crc32, isize
+
+
+def _decompress_block(payload_compressed: bytes, crc32: int, isize: int) -> bytes:
+    payload = _inflate(payload_compressed, isize)
+
+    if _crc32(payload) != crc32:
         logging.warning("BGZF block CRC32 failed to validate")
-    if len(payload) != block_tailer.ISIZE:
+    if len(payload) != isize:
         logging.warning("BGZF block data size does not match metadata")
 
     return payload
 
 
-def index(source: BufferedIOBase, destination: BufferedIOBase):
-    block_header_length = struct.calcsize(BGZF_HEADER_STRUCT_FORMAT)
-    block_tailer_length = struct.calcsize(BGZF_TAILER_STRUCT_FORMAT)
+def _read_block(source: BufferedIOBase) -> bytes:
+    raw_block = _read_raw_block(source)
+    if raw_block is None:
+        return b""
+
+    return _decompress_block(*raw_block)
+
+
+# set FASTAH_PARALLEL_DECOMPRESS=0 to inflate blocks on the calling thread only
+PARALLEL_DECOMPRESS = os.environ.get("FASTAH_PARALLEL_DECOMPRESS", "1") != "0"
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    # concurrent fetches must not each create (and leak) a pool
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+    return _executor
+
+
+def _reset_executor():
+    global _executor, _executor_lock
+    # a forked child doesn't inherit the pool's threads, so it needs its own
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_executor)
+
+
+def _decompress_blocks(raw_blocks: list[tuple[bytes, int, int]]) -> list[bytes]:
+    if (len(raw_blocks) <= 1) or (not PARALLEL_DECOMPRESS):
+        return [_decompress_block(*raw_block) for raw_block in raw_blocks]
+
+    # inflating releases the GIL, so decompress the blocks concurrently
+    return list(_get_executor().map(_decompress_block, *zip(*raw_blocks)))
+
+
+def _parse_raw_blocks(data: bytes) -> list[tuple[memoryview, int, int]]:
+    block_header_length = BGZF_HEADER_STRUCT.size
+    block_tailer_length = BGZF_TAILER_STRUCT.size
+
+    # slice out each block's payload without copying it
+    view = memoryview(data)
+    raw_blocks = []
+    block_start = 0
+    while block_start < len(data):
+        bsize = BGZF_HEADER_STRUCT.unpack_from(data, block_start)[-1]
+        payload_end = block_start + bsize + 1 - block_tailer_length
+        crc32, isize = BGZF_TAILER_STRUCT.unpack_from(data, payload_end)
+        raw_blocks.append(
+            (view[block_start + block_header_length : payload_end], crc32, isize)
+        )
+        block_start = payload_end + block_tailer_length
+
+    return raw_blocks
+
+
+def decompress_each(chunks: list[bytes]) -> list[bytes]:
+    """Decompresses each chunk of whole BGZF blocks, inflating them all in parallel."""
+
+    raw_blocks = []
+    chunk_lengths = []
+    for chunk in chunks:
+        chunk_blocks = _parse_raw_blocks(chunk)
+        raw_blocks.extend(chunk_blocks)
+        chunk_lengths.append(len(chunk_blocks))
+
+    blocks = _decompress_blocks(raw_blocks)
+    decompressed = []
+    block_start = 0
+    for chunk_length in chunk_lengths:
+        decompressed.append(b"".join(blocks[block_start : block_start + chunk_length]))
+        block_start += chunk_length
+
+    return decompressed
+
+
+def read_block_range(
+    source: BufferedIOBase, start_compressed_offset: int, num_blocks: int
+) -> list[bytes]:
+    # reading is I/O bound, so gather the compressed blocks sequentially
+    source.seek(start_compressed_offset)
+    raw_blocks = []
+    while len(raw_blocks) < num_blocks:
+        raw_block = _read_raw_block(source)
+        if raw_block is None:
+            break
+        raw_blocks.append(raw_block)
+
+    return _decompress_blocks(raw_blocks)
+
+
+def _scan_blocks_mapped(buffer: mmap.mmap) -> list[tuple[int, int]]:
+    block_header_length = BGZF_HEADER_STRUCT.size
+    block_tailer_length = BGZF_TAILER_STRUCT.size
+
+    blocks = []
+    compressed_offset = 0
+    uncompressed_offset = 0
+    while (compressed_offset + block_header_length) <= len(buffer):
+        bsize = BGZF_HEADER_STRUCT.unpack_from(buffer, compressed_offset)[-1]
+        blocks.append((compressed_offset, uncompressed_offset))
+        _, isize = BGZF_TAILER_STRUCT.unpack_from(
+            buffer, compressed_offset + bsize + 1 - block_tailer_length
+        )
+        uncompressed_offset += isize
+        compressed_offset += bsize + 1
+
+    return blocks
+
+
+def _scan_blocks_streamed(source: BufferedIOBase) -> list[tuple[int, int]]:
+    block_header_length = BGZF_HEADER_STRUCT.size
+    block_tailer_length = BGZF_TAILER_STRUCT.size
 
     blocks = []
     source.seek(0)
@@ -121,40 +334,56 @@ def index(source: BufferedIOBase, destination: BufferedIOBase):
     uncompressed_offset = 0
     block_header = source.read(block_header_length)
     while block_header:
-        block_header = BGZFHeader(
-            *struct.unpack(BGZF_HEADER_STRUCT_FORMAT, block_header)
-        )
+        bsize = BGZF_HEADER_STRUCT.unpack(block_header)[-1]
         blocks.append((compressed_offset, uncompressed_offset))
-        # skip content
-        source.seek(compressed_offset + block_header.BSIZE + 1 - block_tailer_length)
-        block_tailer = BGZFTailer(
-            *struct.unpack(BGZF_TAILER_STRUCT_FORMAT, source.read(block_tailer_length))
-        )
-        uncompressed_offset += block_tailer.ISIZE
+        # read the rest of the block in one call instead of seeking to the tailer
+        block_remainder = source.read(bsize + 1 - block_header_length)
+        _, isize = BGZF_TAILER_STRUCT.unpack(block_remainder[-block_tailer_length:])
+        uncompressed_offset += isize
 
         # set up next loop
-        compressed_offset = source.tell()
+        compressed_offset += bsize + 1
         block_header = source.read(block_header_length)
 
+    return blocks
+
+
+def index(source: BufferedIOBase, destination: BufferedIOBase):
+    try:
+        buffer = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # not backed by a (non-empty) file
+        blocks = _scan_blocks_streamed(source)
+    else:
+        # walking a memory map of the file avoids a read call per block
+        with buffer:
+            blocks = _scan_blocks_mapped(buffer)
+
     # don't include first and last (empty) block
     blocks = blocks[1:-1]
-    destination.write(struct.pack("<Q", len(blocks)))
-    for block in blocks:
-        destination.write(struct.pack("<QQ", *block))
+    _gzi.write(destination, blocks)
+
+
+def _is_gzip_header(header: bytes) -> bool:
+    return header.startswith(GZIP_HEADER)
+
+
+def _is_bgzf_header(header: bytes) -> bool:
+    return header.startswith(BGZF_HEADER)
 
 
 def is_gzip(stream: BufferedIOBase) -> bool:
     header = stream.read(len(GZIP_HEADER))
     # reset the offset
-    stream.seek(stream.tell() - len(GZIP_HEADER))
-    return header == GZIP_HEADER
+    stream.seek(-len(header), SEEK_CUR)
+    return _is_gzip_header(header)
 
 
 def is_bgzf(stream: BufferedIOBase) -> bool:
     header = stream.read(len(BGZF_HEADER))
     # reset the offset
-    stream.seek(stream.tell() - len(BGZF_HEADER))
-    return header == BGZF_HEADER
+    stream.seek(-len(header), SEEK_CUR)
+    return _is_bgzf_header(header)
 
 
 def _deflate_bound(
@@ -0,0 +1,36 @@
+import struct
+import sys
+from array import array
+from io import BufferedIOBase
+
+GZI_COUNT_STRUCT = struct.Struct("<Q")
+GZI_ENTRY_STRUCT = struct.Struct("<QQ")
+
+
+def write(destination: BufferedIOBase, blocks: list[tuple[int, int]]):
+    """Writes (compressed offset, uncompressed offset) pairs as a GZI index."""
+
+    # serialize every entry into one buffer so there is only a single write
+    buffer = bytearray(GZI_COUNT_STRUCT.size + (GZI_ENTRY_STRUCT.size * len(blocks)))
+    GZI_COUNT_STRUCT.pack_into(buffer, 0, len(blocks))
+    offset = GZI_COUNT_STRUCT.size
+    for compressed_offset, uncompressed_offset in blocks:
+        GZI_ENTRY_STRUCT.pack_into(
+            buffer, offset, compressed_offset, uncompressed_offset
+        )
+        offset += GZI_ENTRY_STRUCT.size
+
+    destination.write(buffer)
+
+
+def read(source: BufferedIOBase) -> tuple[array, array]:
+    """Reads the compressed and uncompressed offsets from a GZI index."""
+
+    (number_entries,) = GZI_COUNT_STRUCT.unpack(source.read(GZI_COUNT_STRUCT.size))
+    # load every entry at once, rather than unpacking them one by one
+    entries = array("Q")
+    entries.frombytes(source.read(GZI_ENTRY_STRUCT.size * number_entries))
+    if sys.byteorder == "big":
+        entries.byteswap()
+
+    return entries[0::2], entries[1::2]
@@ -1,6 +1,19 @@
+import os
 import struct
-from io import BufferedIOBase, TextIOWrapper
-from typing import Callable
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import (
+    DEFAULT_BUFFER_SIZE,
+    SEEK_CUR,
+    SEEK_END,
+    BufferedIOBase,
+    BufferedReader,
+)
+from typing import Callable, Optional
+
+from . import _gzi
+from ._bgzf import _split_blocks
 
 try:
     import zstandard
@@ -9,65 +22,276 @@ try:
 except ModuleNotFoundError:
     _HAS_ZSTD = False
 
+# https://github.com/facebook/zstd/blob/dev/contrib/seekable_format/zstd_seekable_compression_format.md
+SEEK_TABLE_MAGIC_NUMBER = 0x184D2A5E
+SEEKABLE_MAGIC_NUMBER = 0x8F92EAB1
+SKIPPABLE_FRAME_HEADER_STRUCT = struct.Struct("<LL")
+SEEK_TABLE_FOOTER_STRUCT = struct.Struct("<LBL")
+SEEK_TABLE_CHECKSUM_FLAG = 0x80
+SEEK_TABLE_ENTRY_STRUCT = struct.Struct("<LL")
+DEFAULT_FRAME_SIZE_IN_BYTES = 2 * 1024 * 1024
+# https://github.com/facebook/zstd/blob/dev/doc/zstd_compression_format.md
+FRAME_HEADER_MAX_SIZE_IN_BYTES = 18
+MAGIC_NUMBER_STRUCT = struct.Struct("<L")
+FRAME_MAGIC_NUMBER = 0xFD2FB528
+SKIPPABLE_MAGIC_NUMBER = 0x184D2A50
+SKIPPABLE_MAGIC_NUMBER_MASK = 0xFFFFFFF0
+BLOCK_HEADER_SIZE_IN_BYTES = 3
+BLOCK_TYPE_RLE = 1
+CONTENT_CHECKSUM_SIZE_IN_BYTES = 4
+ZSTD_COMPRESSION_LEVEL = 3
+
+# (de)compression contexts can't be shared between threads, so each thread
+# lazily creates and reuses its own
+_thread_local = threading.local()
+
 
 def _requires_zstandard(func: Callable) -> Callable:
-    def wrapper(*args, **kwargs):
-        if not _HAS_ZSTD:
-            raise RuntimeError("zstandard must be installed")
-        return func(*args, **kwargs)
+    # resolved once at import time so calls don't pay for an extra wrapper
+    if _HAS_ZSTD:
+        return func
+
+    def unavailable(*args, **kwargs):
+        raise RuntimeError("zstandard must be installed")
 
-    return wrapper
+    return unavailable
+
+
+@_requires_zstandard
+def _is_zstd_header(header: bytes) -> bool:
+    return header.startswith(zstandard.FRAME_HEADER)
 
 
 @_requires_zstandard
 def is_zstd(stream: BufferedIOBase) -> bool:
     header = stream.read(4)
     # reset the offset
-    stream.seek(stream.tell() - 4)
-    return header == zstandard.FRAME_HEADER
+    stream.seek(-len(header), SEEK_CUR)
+    return _is_zstd_header(header)
+
+
+def _write_seek_table(destination: BufferedIOBase, frames: list[tuple[int, int]]):
+    entries = b"".join(
+        SEEK_TABLE_ENTRY_STRUCT.pack(compressed_size, decompressed_size)
+        for compressed_size, decompressed_size in frames
+    )
+    footer = SEEK_TABLE_FOOTER_STRUCT.pack(len(frames), 0, SEEKABLE_MAGIC_NUMBER)
+
+    destination.write(
+        SKIPPABLE_FRAME_HEADER_STRUCT.pack(
+            SEEK_TABLE_MAGIC_NUMBER, len(entries) + len(footer)
+        )
+    )
+    destination.write(entries)
+    destination.write(footer)
+
+
+def _get_compressor() -> "zstandard.ZstdCompressor":
+    compressor = getattr(_thread_local, "compressor", None)
+    if compressor is None:
+        compressor = zstandard.ZstdCompressor(level=ZSTD_COMPRESSION_LEVEL)
+        _thread_local.compressor = compressor
+
+    return compressor
+
+
+def _compress_frame(frame: bytes) -> tuple[bytes, int]:
+    return _get_compressor().compress(frame), len(frame)
+
+
+@_requires_zstandard
+def compress(
+    source: BufferedIOBase,
+    destination: BufferedIOBase,
+    frame_size: int = DEFAULT_FRAME_SIZE_IN_BYTES,
+    threads: Optional[int] = None,
+):
+    """Compresses source into independent zstd frames followed by a seek table.
+
+    Frames are split on newlines where possible, like BGZF blocks, and the
+    output follows the zstd seekable format. With more than one thread,
+    frames are compressed concurrently.
+    """
+
+    if threads is None:
+        threads = os.cpu_count() or 1
+
+    frames = []
+
+    def write_frame(compressed: bytes, decompressed_size: int):
+        destination.write(compressed)
+        frames.append((len(compressed), decompressed_size))
+
+    if threads > 1:
+        # zstd releases the GIL, so frames can be compressed concurrently
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            pending = deque()
+            for frame in _split_blocks(source, frame_size):
+                pending.append(executor.submit(_compress_frame, frame))
+                # limit the number of frames held in memory at once
+                if len(pending) >= (2 * threads):
+                    write_frame(*pending.popleft().result())
+
+            # write frames in the order they were read
+            while pending:
+                write_frame(*pending.popleft().result())
+    else:
+        for frame in _split_blocks(source, frame_size):
+            write_frame(*_compress_frame(frame))
+
+    _write_seek_table(destination, frames)
+
+
+def _read_seek_table(source: BufferedIOBase) -> Optional[list[tuple[int, int]]]:
+    """Reads the (compressed size, decompressed size) of each frame from a seek table.
+
+    Returns None if the source doesn't end with a zstd seekable format seek table.
+    """
+
+    source_length = source.seek(0, SEEK_END)
+    if source_length < SEEK_TABLE_FOOTER_STRUCT.size:
+        return None
+
+    source.seek(-SEEK_TABLE_FOOTER_STRUCT.size, SEEK_END)
+    number_frames, descriptor, seekable_magic_number = SEEK_TABLE_FOOTER_STRUCT.unpack(
+        source.read(SEEK_TABLE_FOOTER_STRUCT.size)
+    )
+    if seekable_magic_number != SEEKABLE_MAGIC_NUMBER:
+        return None
+
+    entry_struct = (
+        struct.Struct("<LLL")
+        if (descriptor & SEEK_TABLE_CHECKSUM_FLAG)
+        else SEEK_TABLE_ENTRY_STRUCT
+    )
+    seek_table_length = (
+        number_frames * entry_struct.size
+    ) + SEEK_TABLE_FOOTER_STRUCT.size
+    if source_length < (seek_table_length + SKIPPABLE_FRAME_HEADER_STRUCT.size):
+        return None
+
+    source.seek(-(seek_table_length + SKIPPABLE_FRAME_HEADER_STRUCT.size), SEEK_END)
+    magic_number, frame_size = SKIPPABLE_FRAME_HEADER_STRUCT.unpack(
+        source.read(SKIPPABLE_FRAME_HEADER_STRUCT.size)
+    )
+    if (magic_number != SEEK_TABLE_MAGIC_NUMBER) or (frame_size != seek_table_length):
+        return None
+
+    entries = source.read(number_frames * entry_struct.size)
+    return [entry[:2] for entry in entry_struct.iter_unpack(entries)]
+
+
+@_requires_zstandard
+def _scan_frame(source: BufferedIOBase) -> Optional[tuple[int, int]]:
+    """Finds the (compressed size, decompressed size) of the frame at the current offset.
+
+    Only frame and block headers are read; the frame is decompressed only if its
+    header doesn't record the decompressed size. Returns None at the end of the
+    stream.
+    """
+
+    frame_offset = source.tell()
+    frame_header = source.read(FRAME_HEADER_MAX_SIZE_IN_BYTES)
+    if len(frame_header) < MAGIC_NUMBER_STRUCT.size:
+        return None
+
+    (magic_number,) = MAGIC_NUMBER_STRUCT.unpack_from(frame_header)
+    if (magic_number & SKIPPABLE_MAGIC_NUMBER_MASK) == SKIPPABLE_MAGIC_NUMBER:
+        _, frame_size = SKIPPABLE_FRAME_HEADER_STRUCT.unpack_from(frame_header)
+        compressed_size = SKIPPABLE_FRAME_HEADER_STRUCT.size + frame_size
+        source.seek(frame_offset + compressed_size)
+        return compressed_size, 0
+
+    # walk the block headers to find where the frame ends
+    offset = frame_offset + zstandard.frame_header_size(frame_header)
+    is_last_block = False
+    while not is_last_block:
+        source.seek(offset)
+        block_header = int.from_bytes(
+            source.read(BLOCK_HEADER_SIZE_IN_BYTES), byteorder="little"
+        )
+        is_last_block = block_header & 1
+        block_type = (block_header >> 1) & 0b11
+        block_size = block_header >> 3
+        # RLE blocks store a single byte regardless of their size
+        offset += BLOCK_HEADER_SIZE_IN_BYTES + (
+            1 if (block_type == BLOCK_TYPE_RLE) else block_size
+        )
+    if zstandard.get_frame_parameters(frame_header).has_checksum:
+        offset += CONTENT_CHECKSUM_SIZE_IN_BYTES
+    compressed_size = offset - frame_offset
+
+    decompressed_size = zstandard.frame_content_size(frame_header)
+    if decompressed_size < 0:
+        # size wasn't stored in the frame header, fall back to decompressing
+        source.seek(frame_offset)
+        decompressed_size = len(_decompress(source.read(compressed_size)))
+
+    source.seek(offset)
+    return compressed_size, decompressed_size
 
 
 @_requires_zstandard
 def index(source: BufferedIOBase, destination: BufferedIOBase):
     blocks = []
-    source.seek(0)
     compressed_offset = 0
     uncompressed_offset = 0
-    compressor = zstandard.ZstdDecompressor()
-    reader = compressor.stream_reader(source=source, read_across_frames=False)
 
-    block = reader.read()
-    while block:
-        blocks.append((compressed_offset, uncompressed_offset))
-        compressed_offset = source.tell()
-        uncompressed_offset += len(block)
-        block = reader.read()
+    seek_table = _read_seek_table(source)
+    if seek_table is not None:
+        # frame offsets can be computed without touching the frames themselves
+        for compressed_size, decompressed_size in seek_table:
+            blocks.append((compressed_offset, uncompressed_offset))
+            compressed_offset += compressed_size
+            uncompressed_offset += decompressed_size
+    else:
+        source.seek(0)
+        frame = _scan_frame(source)
+        while frame is not None:
+            compressed_size, decompressed_size = frame
+            # skippable frames don't hold any sequence data
+            if decompressed_size:
+                blocks.append((compressed_offset, uncompressed_offset))
+            compressed_offset += compressed_size
+            uncompressed_offset += decompressed_size
+            frame = _scan_frame(source)
 
     # don't include first block
     blocks = blocks[1:]
-    destination.write(struct.pack("<Q", len(blocks)))
-    for block in blocks:
-        destination.write(struct.pack("<QQ", *block))
+    _gzi.write(destination, blocks)
+
+
+def _get_decompressor() -> "zstandard.ZstdDecompressor":
+    decompressor = getattr(_thread_local, "decompressor", None)
+    if decompressor is None:
+        decompressor = zstandard.ZstdDecompressor()
+        _thread_local.decompressor = decompressor
+
+    return decompressor
 
 
 @_requires_zstandard
 def _decompress(source: bytes) -> bytes:
-    decompressor = zstandard.ZstdDecompressor()
-    return decompressor.decompress(source)
+    # source may span several frames, which ZstdDecompressor.decompress won't read
+    reader = _get_decompressor().stream_reader(source, read_across_frames=True)
+    return reader.read()
 
 
 @_requires_zstandard
 def _read_frame(source: BufferedIOBase) -> bytes:
-    decompressor = zstandard.ZstdDecompressor()
+    decompressor = _get_decompressor()
     reader = decompressor.stream_reader(source=source, read_across_frames=False)
 
     return reader.read()
 
 
 @_requires_zstandard
-def _get_line_iterator(source: BufferedIOBase) -> TextIOWrapper:
+def _get_reader(
+    source: BufferedIOBase, buffer_size: int = DEFAULT_BUFFER_SIZE
+) -> BufferedReader:
     decompressor = zstandard.ZstdDecompressor()
-    byte_stream = decompressor.stream_reader(source=source)
-    text_stream = TextIOWrapper(byte_stream, encoding="utf-8")
-
-    return text_stream
+    # buffer the decompressed bytes so each read doesn't decompress a small
+    # piece of the frame
+    return BufferedReader(
+        decompressor.stream_reader(source=source), buffer_size=buffer_size
+    )
@@ -0,0 +1,372 @@
+import gzip
+import multiprocessing
+import random
+import struct
+import tempfile
+import unittest
+from io import BytesIO, StringIO
+from pathlib import Path
+
+import fastah.compression._bgzf as bgzf
+import fastah.compression._gzi as _gzi
+import fastah.compression._zstd as _zstd
+import fastah.fasta
+from fastah import FASTAFile
+
+if _zstd._HAS_ZSTD:
+    import zstandard
+
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+def _random_fasta(number_records: int, record_length: int, line_width: int) -> bytes:
+    rng = random.Random(42)
+    lines = []
+    for i in range(number_records):
+        lines.append(f">seq{i}")
+        sequence = "".join(rng.choices("ACGT", k=record_length))
+        lines.extend(
+            sequence[j : j + line_width] for j in range(0, record_length, line_width)
+        )
+
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _in_forked_child(function, *args):
+    # a timeout turns a deadlocked child into a failure instead of a hang
+    with multiprocessing.get_context("fork").Pool(1) as pool:
+        return pool.apply_async(function, args).get(timeout=60)
+
+
+def _decompress(data: bytes) -> bytes:
+    return bgzf.decompress_each([data])[0]
+
+
+def _fetch(fasta: FASTAFile, seqid: str) -> str:
+    return fasta[seqid][:]
+
+
+class TestBGZFCompression(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._source = _random_fasta(
+            number_records=3, record_length=100_000, line_width=60
+        )
+
+        compressed = BytesIO(b"")
+        bgzf.compress(BytesIO(cls._source), compressed)
+        cls._compressed = compressed.getvalue()
+
+    def test_roundtrip(self):
+        self.assertEqual(gzip.decompress(self._compressed), self._source)
+
+    def test_eof_marker(self):
+        self.assertTrue(self._compressed.endswith(BGZF_EOF))
+
+    def test_blocks_split_on_newlines(self):
+        source = BytesIO(self._compressed)
+        block = bgzf._read_block(source)
+        while block:
+            self.assertTrue(block.endswith(b"\n"))
+            block = bgzf._read_block(source)
+
+    def test_index(self):
+        index = BytesIO(b"")
+        bgzf.index(BytesIO(self._compressed), index)
+        index = index.getvalue()
+
+        (number_entries,) = struct.unpack_from("<Q", index)
+        self.assertEqual(len(index), 8 + (16 * number_entries))
+        self.assertGreater(number_entries, 0)
+        source = BytesIO(self._compressed)
+        for compressed_offset, uncompressed_offset in struct.iter_unpack(
+            "<QQ", index[8:]
+        ):
+            source.seek(compressed_offset)
+            block = bgzf._read_block(source)
+            self.assertEqual(
+                block,
+                self._source[uncompressed_offset : uncompressed_offset + len(block)],
+            )
+
+    def test_gzi_roundtrip(self):
+        index = BytesIO(b"")
+        bgzf.index(BytesIO(self._compressed), index)
+        index.seek(0)
+
+        compressed_offsets, uncompressed_offsets = _gzi.read(index)
+        self.assertEqual(
+            index.getvalue()[8:],
+            b"".join(
+                struct.pack("<QQ", compressed_offset, uncompressed_offset)
+                for compressed_offset, uncompressed_offset in zip(
+                    compressed_offsets, uncompressed_offsets
+                )
+            ),
+        )
+
+    def test_index_file(self):
+        index = BytesIO(b"")
+        bgzf.index(BytesIO(self._compressed), index)
+
+        index_file = BytesIO(b"")
+        with tempfile.TemporaryFile() as compressed_file:
+            compressed_file.write(self._compressed)
+            compressed_file.flush()
+            bgzf.index(compressed_file, index_file)
+
+        self.assertEqual(index_file.getvalue(), index.getvalue())
+
+    def test_read_block_range(self):
+        source = BytesIO(self._compressed)
+        blocks = bgzf.read_block_range(source, 0, 4)
+        self.assertEqual(len(blocks), 4)
+        remainder = bgzf.read_block_range(source, source.tell(), 1_000)
+        self.assertEqual(b"".join(blocks + remainder), self._source)
+
+    def test_decompress(self):
+        self.assertEqual(_decompress(self._compressed), self._source)
+
+    @unittest.skipUnless(
+        "fork" in multiprocessing.get_all_start_methods(), "requires fork"
+    )
+    def test_decompress_after_fork(self):
+        # the parent's pool has threads that a forked child doesn't inherit
+        self.assertEqual(_decompress(self._compressed), self._source)
+        self.assertEqual(_in_forked_child(_decompress, self._compressed), self._source)
+
+    def test_decompress_serial(self):
+        parallel_decompress = bgzf.PARALLEL_DECOMPRESS
+        bgzf.PARALLEL_DECOMPRESS = False
+        try:
+            self.assertEqual(_decompress(self._compressed), self._source)
+        finally:
+            bgzf.PARALLEL_DECOMPRESS = parallel_decompress
+
+    def test_iterate(self):
+        records = list(
+            FASTAFile(
+                source=BytesIO(self._compressed), index=False, index_compressed=False
+            )
+        )
+        expected = self._source.decode("utf-8").split(">")[1:]
+        self.assertEqual(
+            [(record.id, record.sequence) for record in records],
+            [
+                (record.split("\n")[0], "".join(record.split("\n")[1:]))
+                for record in expected
+            ],
+        )
+
+    def _indexed_file(self) -> FASTAFile:
+        index = StringIO("")
+        fastah.fasta.index(StringIO(self._source.decode("utf-8")), index)
+        index.seek(0)
+        index_compressed = BytesIO(b"")
+        bgzf.index(BytesIO(self._compressed), index_compressed)
+        index_compressed.seek(0)
+
+        return FASTAFile(
+            source=BytesIO(self._compressed),
+            index=index,
+            index_compressed=index_compressed,
+        )
+
+    def test_fetch_cached(self):
+        with self._indexed_file() as fasta:
+            record = self._source.decode("utf-8").split(">")[2]
+            sequence = "".join(record.split("\n")[1:])
+            # overlapping fetches mix cached and freshly read blocks
+            self.assertEqual(fasta["seq1"][1_000:40_000], sequence[1_000:40_000])
+            self.assertEqual(fasta["seq1"][:60_000], sequence[:60_000])
+            self.assertEqual(fasta["seq1"][:], sequence)
+
+    def test_fetch_pipelined(self):
+        read_size = fastah.fasta.FETCH_READ_SIZE
+        fastah.fasta.FETCH_READ_SIZE = 1
+        try:
+            with self._indexed_file() as fasta:
+                record = self._source.decode("utf-8").split(">")[3]
+                sequence = "".join(record.split("\n")[1:])
+                self.assertEqual(fasta["seq2"][:], sequence)
+        finally:
+            fastah.fasta.FETCH_READ_SIZE = read_size
+
+    def _indexed_path(self, directory: str) -> Path:
+        path = Path(directory) / "random.fa.gz"
+        path.write_bytes(self._compressed)
+        fastah.fasta.index(path, path.with_suffix(".gz.fai"))
+        with open(path.with_suffix(".gz.gzi"), "wb") as index_compressed:
+            bgzf.index(BytesIO(self._compressed), index_compressed)
+
+        return path
+
+    @unittest.skipUnless(
+        "fork" in multiprocessing.get_all_start_methods(), "requires fork"
+    )
+    def test_fetch_after_fork(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with FASTAFile(source=self._indexed_path(directory)) as fasta:
+                record = self._source.decode("utf-8").split(">")[2]
+                sequence = "".join(record.split("\n")[1:])
+                # fetch in the parent first, then in a worker it forked
+                self.assertEqual(_fetch(fasta, "seq1"), sequence)
+                self.assertEqual(_in_forked_child(_fetch, fasta, "seq1"), sequence)
+
+    @unittest.skipUnless(
+        "fork" in multiprocessing.get_all_start_methods(), "requires fork"
+    )
+    def test_fetch_pipelined_after_fork(self):
+        read_size = fastah.fasta.FETCH_READ_SIZE
+        fastah.fasta.FETCH_READ_SIZE = 1
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                with FASTAFile(source=self._indexed_path(directory)) as fasta:
+                    record = self._source.decode("utf-8").split(">")[3]
+                    sequence = "".join(record.split("\n")[1:])
+                    self.assertEqual(_fetch(fasta, "seq2"), sequence)
+                    self.assertEqual(_in_forked_child(_fetch, fasta, "seq2"), sequence)
+        finally:
+            fastah.fasta.FETCH_READ_SIZE = read_size
+
+    def test_threads_match_serial(self):
+        compressed = BytesIO(b"")
+        bgzf.compress(BytesIO(self._source), compressed, threads=1)
+        self.assertEqual(compressed.getvalue(), self._compressed)
+
+    def test_no_newline(self):
+        source = b"A" * (bgzf.UNCOMPRESSED_BLOCK_DATA_BOUND_IN_BYTES + 10)
+        compressed = BytesIO(b"")
+        bgzf.compress(BytesIO(source), compressed)
+        self.assertEqual(gzip.decompress(compressed.getvalue()), source)
+
+
+@unittest.skipUnless(_zstd._HAS_ZSTD, "requires zstandard")
+class TestZstdSeekTable(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._frames = [b">seq1\nACGT\nAC\n", b">seq2\nGGCC\n", b">seq3\nT\n"]
+
+        compressor = zstandard.ZstdCompressor()
+        compressed_frames = [compressor.compress(frame) for frame in cls._frames]
+        seek_table = b"".join(
+            struct.pack("<LL", len(compressed), len(frame))
+            for compressed, frame in zip(compressed_frames, cls._frames)
+        ) + struct.pack("<LBL", len(cls._frames), 0, _zstd.SEEKABLE_MAGIC_NUMBER)
+        cls._compressed = (
+            b"".join(compressed_frames)
+            + struct.pack("<LL", _zstd.SEEK_TABLE_MAGIC_NUMBER, len(seek_table))
+            + seek_table
+        )
+        cls._compressed_frames = compressed_frames
+
+    def test_read_seek_table(self):
+        self.assertEqual(
+            _zstd._read_seek_table(BytesIO(self._compressed)),
+            [
+                (len(compressed), len(frame))
+                for compressed, frame in zip(self._compressed_frames, self._frames)
+            ],
+        )
+
+    def test_read_seek_table_missing(self):
+        self.assertIsNone(
+            _zstd._read_seek_table(BytesIO(b"".join(self._compressed_frames)))
+        )
+
+    def test_index(self):
+        index = BytesIO(b"")
+        _zstd.index(BytesIO(self._compressed), index)
+
+        first_length = len(self._compressed_frames[0])
+        self.assertEqual(
+            index.getvalue(),
+            struct.pack(
+                "<QQQQQ",
+                2,
+                first_length,
+                len(self._frames[0]),
+                first_length + len(self._compressed_frames[1]),
+                len(self._frames[0]) + len(self._frames[1]),
+            ),
+        )
+
+    def test_index_without_seek_table(self):
+        # a checksummed frame without a recorded size, followed by a skippable frame
+        compressor = zstandard.ZstdCompressor(write_checksum=True)
+        stream = compressor.compressobj()
+        frames = [stream.compress(self._frames[0]) + stream.flush()]
+        frames.append(struct.pack("<LL", 0x184D2A53, 3) + b"abc")
+        frames.extend(self._compressed_frames[1:])
+
+        index = BytesIO(b"")
+        _zstd.index(BytesIO(b"".join(frames)), index)
+
+        second_offset = len(frames[0]) + len(frames[1])
+        self.assertEqual(
+            index.getvalue(),
+            struct.pack(
+                "<QQQQQ",
+                2,
+                second_offset,
+                len(self._frames[0]),
+                second_offset + len(frames[2]),
+                len(self._frames[0]) + len(self._frames[1]),
+            ),
+        )
+
+
+@unittest.skipUnless(_zstd._HAS_ZSTD, "requires zstandard")
+class TestZstdCompression(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._source = _random_fasta(
+            number_records=3, record_length=1_000, line_width=60
+        )
+
+        compressed = BytesIO(b"")
+        _zstd.compress(BytesIO(cls._source), compressed, frame_size=512)
+        cls._compressed = compressed.getvalue()
+
+    def test_roundtrip(self):
+        self.assertEqual(_zstd._decompress(self._compressed), self._source)
+
+    def test_threads_roundtrip(self):
+        compressed = BytesIO(b"")
+        _zstd.compress(BytesIO(self._source), compressed, frame_size=512, threads=2)
+        self.assertEqual(_zstd._decompress(compressed.getvalue()), self._source)
+
+    def test_threads_match_serial(self):
+        compressed = BytesIO(b"")
+        _zstd.compress(BytesIO(self._source), compressed, frame_size=512, threads=1)
+        self.assertEqual(compressed.getvalue(), self._compressed)
+
+    def test_seek_table(self):
+        seek_table = _zstd._read_seek_table(BytesIO(self._compressed))
+        self.assertGreater(len(seek_table), 1)
+        self.assertEqual(
+            sum(decompressed_size for _, decompressed_size in seek_table),
+            len(self._source),
+        )
+
+    def test_fetch_across_frames(self):
+        index = StringIO("")
+        fastah.fasta.index(StringIO(self._source.decode("utf-8")), index)
+        index.seek(0)
+        index_compressed = BytesIO(b"")
+        _zstd.index(BytesIO(self._compressed), index_compressed)
+        index_compressed.seek(0)
+
+        with FASTAFile(
+            source=BytesIO(self._compressed),
+            index=index,
+            index_compressed=index_compressed,
+        ) as fasta:
+            record = self._source.decode("utf-8").split(">")[2]
+            sequence = "".join(record.split("\n")[1:])
+            self.assertEqual(fasta["seq1"][:], sequence)
+            self.assertEqual(fasta["seq1"][100:900], sequence[100:900])
+
+
+if __name__ == "__main__":
+    unittest.main()
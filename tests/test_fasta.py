@@ -1,7 +1,11 @@
-import textwrap
+import functools
+import os
+import pickle
+import tempfile
 import unittest
 import zlib
-from io import BytesIO, StringIO
+from io import BufferedReader, BytesIO, StringIO
+from pathlib import Path
 
 import fastah.compression._bgzf as bgzf
 import fastah.compression._zstd as _zstd
@@ -12,26 +16,34 @@ if _zstd._HAS_ZSTD:
     import zstandard
 
 
+@functools.cache
+def _compress_bgzf(source: bytes) -> tuple[bytes, bytes]:
+    compressed = BytesIO(b"")
+    bgzf.compress(BytesIO(source), compressed)
+    index_compressed = BytesIO(b"")
+    bgzf.index(compressed, index_compressed)
+
+    return compressed.getvalue(), index_compressed.getvalue()
+
+
+@functools.cache
+def _compress_gzip(source: bytes) -> bytes:
+    return zlib.compress(source, wbits=31)
+
+
+@functools.cache
+def _compress_zstd(source: bytes) -> tuple[bytes, bytes]:
+    compressed = zstandard.ZstdCompressor().compress(source)
+    index_compressed = BytesIO(b"")
+    _zstd.index(BytesIO(compressed), index_compressed)
+
+    return compressed, index_compressed.getvalue()
+
+
 class SimpleFASTA(unittest.TestCase):
-    @classmethod
-    def setUpClass(cls):
-        cls._source = textwrap.dedent(
-            """\
-            >seq1
-            ACTG
-            ACTG
-            AC
-            >seq2
-            GTC
-            G
-            """
-        )
-        cls._index = textwrap.dedent(
-            """\
-            seq1	10	6	4	5
-            seq2	4	25	3	4
-            """
-        )
+    # shared by every subclass, so there's nothing to build per class
+    _source = ">seq1\nACTG\nACTG\nAC\n>seq2\nGTC\nG\n"
+    _index = "seq1\t10\t6\t4\t5\nseq2\t4\t25\t3\t4\n"
 
 
 class TestUncompressedFASTAIndexing(SimpleFASTA):
@@ -44,6 +56,52 @@ class TestUncompressedFASTAIndexing(SimpleFASTA):
         fastah.fasta.index(StringIO(self._source), index)
         self.assertEqual(self._index, index.getvalue())
 
+    def test_index_binary(self):
+        index = StringIO("")
+        fastah.fasta.index(BytesIO(self._source.encode("utf-8")), index)
+        self.assertEqual(self._index, index.getvalue())
+
+    def test_index_bgzf(self):
+        compressed, _ = _compress_bgzf(self._source.encode("utf-8"))
+
+        index = StringIO("")
+        fastah.fasta.index(BytesIO(compressed), index)
+        self.assertEqual(self._index, index.getvalue())
+
+    def test_index_unknown_format(self):
+        with self.assertRaises(ValueError):
+            fastah.fasta.index(BytesIO(b"\x00\x01\x02\x03ACGT"), StringIO(""))
+
+    def test_index_zstd_unavailable(self):
+        source = _zstd.MAGIC_NUMBER_STRUCT.pack(_zstd.FRAME_MAGIC_NUMBER) + b"ACGT"
+        has_zstd = _zstd._HAS_ZSTD
+        _zstd._HAS_ZSTD = False
+        try:
+            with self.assertRaisesRegex(ValueError, "zstandard"):
+                fastah.fasta.index(BytesIO(source), StringIO(""))
+        finally:
+            _zstd._HAS_ZSTD = has_zstd
+
+    def test_index_empty(self):
+        index = StringIO("")
+        fastah.fasta.index(BytesIO(b""), index)
+        self.assertEqual(index.getvalue(), "")
+
+    def test_index_crlf(self):
+        index = StringIO("")
+        fastah.fasta.index(StringIO(self._source.replace("\n", "\r\n")), index)
+        self.assertEqual("seq1\t10\t7\t4\t6\nseq2\t4\t30\t3\t5\n", index.getvalue())
+
+    def test_index_lines_across_reads(self):
+        read_size = fastah.fasta.INDEX_READ_SIZE
+        fastah.fasta.INDEX_READ_SIZE = 3
+        try:
+            index = StringIO("")
+            fastah.fasta.index(StringIO(self._source), index)
+        finally:
+            fastah.fasta.INDEX_READ_SIZE = read_size
+        self.assertEqual(self._index, index.getvalue())
+
 
 class TestUncompressedIndexedFASTAParsing(SimpleFASTA):
     @classmethod
@@ -56,6 +114,7 @@ class TestUncompressedIndexedFASTAParsing(SimpleFASTA):
         self.assertEqual(self._file["seq1"][1], "C")
         self.assertEqual(self._file["seq2"][3], "G")
         self.assertEqual(self._file["seq1"][-2], "A")
+        self.assertEqual(self._file["seq1"][-1], "C")
 
     def test_index_int_invalid(self):
         with self.assertRaises(IndexError):
@@ -186,6 +245,13 @@ class TestUncompressedIndexedFASTAParsing(SimpleFASTA):
         self.assertEqual(self._file["seq1"][-20:-15:-1], "")
         self.assertEqual(self._file["seq1"][-20:-15:-3], "")
 
+    def test_index_slice_out_of_bounds_reversed(self):
+        sequence = "ACTGACTGAC"
+        self.assertEqual(self._file["seq1"][20:2:-1], sequence[20:2:-1])
+        self.assertEqual(self._file["seq1"][20::-3], sequence[20::-3])
+        self.assertEqual(self._file["seq1"][5:-20:-1], sequence[5:-20:-1])
+        self.assertEqual(self._file["seq1"][-20:20:2], sequence[-20:20:2])
+
     def test_record_length(self):
         self.assertEqual(len(self._file["seq1"]), 10)
         self.assertEqual(len(self._file["seq2"]), 4)
@@ -200,28 +266,71 @@ class TestUncompressedIndexedFASTAParsing(SimpleFASTA):
         with self.assertRaises(ValueError):
             self._file[42]
 
+    def test_index_entries(self):
+        self.assertEqual(list(self._file._index), ["seq1", "seq2"])
+        self.assertEqual(
+            self._file._index["seq2"],
+            fastah.fasta.FaiEntry(
+                name="seq2", length=4, offset=25, linebases=3, linewidth=4
+            ),
+        )
+
+    def test_index_inconsistent_columns(self):
+        with self.assertRaises(ValueError):
+            FASTAFile(
+                source=StringIO(self._source),
+                index=StringIO(self._index + "seq3\t1\n"),
+            )
+
+    def test_record_getitems(self):
+        keys = [slice(None, 4), 3, -1, slice(8, 2, -2), slice(20, 2, -1), slice(5, 5)]
+        expected = ["ACTGACTGAC"[key] for key in keys]
+        self.assertEqual(self._file["seq1"].getitems(keys), expected)
+        self.assertEqual(
+            fastah.fasta.FASTARecord("seq1", "ACTGACTGAC").getitems(keys), expected
+        )
+
+        merge_distance = fastah.fasta.FETCH_MERGE_DISTANCE
+        fastah.fasta.FETCH_MERGE_DISTANCE = 0
+        try:
+            self.assertEqual(self._file["seq1"].getitems(keys), expected)
+        finally:
+            fastah.fasta.FETCH_MERGE_DISTANCE = merge_distance
+
 
 class TestBGZFCompressedIndexedFASTAParsing(SimpleFASTA):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
 
-        compressed = BytesIO(b"")
-        bgzf.compress(BytesIO(cls._source.encode("utf-8")), compressed)
-        index_compressed = BytesIO(b"")
-        bgzf.index(compressed, index_compressed)
-        compressed.seek(0)
-        index_compressed.seek(0)
-
+        # the compressed fixtures are shared, so each file gets its own streams
+        compressed, index_compressed = _compress_bgzf(cls._source.encode("utf-8"))
         cls._file = FASTAFile(
-            source=compressed,
+            source=BytesIO(compressed),
             index=StringIO(cls._index),
-            index_compressed=index_compressed,
+            index_compressed=BytesIO(index_compressed),
         )
 
     def test_index_slice(self):
         self.assertEqual(self._file["seq1"][:4], "ACTG")
 
+    def test_index_slice_cached(self):
+        self.assertEqual(self._file["seq2"][1:3], "TC")
+        self.assertIsNotNone(self._file._block_cache.get(0))
+        self.assertEqual(self._file["seq2"][1:3], "TC")
+
+    def test_block_cache_eviction(self):
+        cache = fastah.fasta._BlockCache(max_size_in_bytes=8)
+        cache.put(0, b"ACTG")
+        cache.put(1, b"GTCA")
+        cache.get(0)
+        cache.put(2, b"AC")
+        cache.put(3, b"ACTGACTGA")
+        self.assertEqual(cache.get(0), b"ACTG")
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.get(2), b"AC")
+        self.assertIsNone(cache.get(3))
+
 
 class TestUncompressedFASTAIterating(SimpleFASTA):
     @classmethod
@@ -237,6 +346,35 @@ class TestUncompressedFASTAIterating(SimpleFASTA):
         self.assertEqual(records[1].id, "seq2")
         self.assertEqual(records[1].sequence, "GTCG")
 
+    def test_record_slice(self):
+        record = next(iter(self._file))
+        self.assertEqual(record[-1], "C")
+        self.assertEqual(record[1:8:3], "CAG")
+        self.assertEqual(record[::-1], "CAGTCAGTCA")
+
+    def test_iter_headers(self):
+        records = list(self._file.iter_headers())
+        self.assertEqual([record.id for record in records], ["seq1", "seq2"])
+        # without an index the sequences aren't available
+        with self.assertRaises(RuntimeError):
+            records[0].sequence
+        with self.assertRaises(RuntimeError):
+            len(records[0])
+
+    def test_iter_headers_across_reads(self):
+        source = ">seq1 first record\nACGT\n>seq2\nAC\n>seq3 last\nGT"
+        read_size = fastah.fasta.INDEX_READ_SIZE
+        fastah.fasta.INDEX_READ_SIZE = 3
+        try:
+            records = list(FASTAFile(source=StringIO(source)).iter_headers())
+        finally:
+            fastah.fasta.INDEX_READ_SIZE = read_size
+
+        self.assertEqual(
+            [(record.id, record.description) for record in records],
+            [("seq1", "first record"), ("seq2", ""), ("seq3", "last")],
+        )
+
 
 class TestUncompressedIndexedFASTAIterating(SimpleFASTA):
     @classmethod
@@ -252,23 +390,117 @@ class TestUncompressedIndexedFASTAIterating(SimpleFASTA):
         self.assertEqual(records[1].id, "seq2")
         self.assertEqual(records[1].sequence, "GTCG")
 
+    def test_iter_headers(self):
+        records = list(self._file.iter_headers())
+        self.assertEqual([record.id for record in records], ["seq1", "seq2"])
+        self.assertEqual(records[0].sequence, "ACTGACTGAC")
+        self.assertEqual(records[1].sequence, "GTCG")
 
-class TestBGZFCompressedIndexedFASTAIteration(SimpleFASTA):
+    def test_iter_headers_without_reading(self):
+        fasta = FASTAFile(source=StringIO(self._source), index=StringIO(self._index))
+        fasta.close()
+        # the records come from the index alone
+        self.assertEqual(
+            [record.id for record in fasta.iter_headers()], ["seq1", "seq2"]
+        )
+
+    def test_iterating_binary(self):
+        records = list(
+            FASTAFile(
+                source=BytesIO(self._source.encode("utf-8")),
+                index=StringIO(self._index),
+                compression="none",
+            )
+        )
+        self.assertEqual(
+            [(record.id, record.sequence) for record in records],
+            [("seq1", "ACTGACTGAC"), ("seq2", "GTCG")],
+        )
+
+    def test_iterating_full_last_lines(self):
+        source = ">seq1\nACTG\nACTG\n>seq2\nGTC\n"
+        index = "seq1\t8\t6\t4\t5\nseq2\t3\t22\t3\t4\n"
+        records = list(FASTAFile(source=StringIO(source), index=StringIO(index)))
+        self.assertEqual(
+            [(record.id, record.sequence) for record in records],
+            [("seq1", "ACTGACTG"), ("seq2", "GTC")],
+        )
+
+
+class TestUncompressedFASTAFileOnDisk(SimpleFASTA):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
 
-        compressed = BytesIO(b"")
-        bgzf.compress(BytesIO(cls._source.encode("utf-8")), compressed)
-        index_compressed = BytesIO(b"")
-        bgzf.index(compressed, index_compressed)
-        compressed.seek(0)
-        index_compressed.seek(0)
+        cls._directory = tempfile.TemporaryDirectory()
+        cls._path = Path(cls._directory.name) / "simple.fa"
+        cls._path.write_text(cls._source)
+        fastah.fasta.index(cls._path, cls._path.with_suffix(".fa.fai"))
+
+        cls._file = FASTAFile(source=cls._path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._file.close()
+        cls._directory.cleanup()
+
+    def test_iterating(self):
+        records = list(self._file)
+        self.assertEqual(records[0].id, "seq1")
+        self.assertEqual(records[0].sequence, "ACTGACTGAC")
+        self.assertEqual(records[1].id, "seq2")
+        self.assertEqual(records[1].sequence, "GTCG")
+
+    def test_index_slice(self):
+        self.assertEqual(self._file["seq1"][2:6], "TGAC")
+
+    def test_pickle(self):
+        unpickled = pickle.loads(pickle.dumps(self._file))
+        self.assertEqual(unpickled["seq2"][:], "GTCG")
+        unpickled.close()
+
+    def test_pickle_record(self):
+        unpickled = pickle.loads(pickle.dumps(self._file["seq2"]))
+        self.assertEqual(unpickled.id, "seq2")
+        self.assertEqual(unpickled[1:], "TCG")
+
+    @unittest.skipUnless(hasattr(os, "pread"), "requires os.pread")
+    def test_positioned_reads(self):
+        self.assertEqual(self._file._fd, self._file._stream.fileno())
+        self.assertEqual(self._file._read_at(6, 4), b"ACTG")
+        self.assertEqual(self._file._read_at(29), b"G\n")
+
+    def test_iterating_unbuffered(self):
+        with FASTAFile(
+            source=open(self._path, "rb", buffering=0),
+            index=False,
+            compression="none",
+        ) as fasta:
+            self.assertIsInstance(fasta._stream, BufferedReader)
+            records = list(fasta)
+        self.assertEqual(
+            [(record.id, record.sequence) for record in records],
+            [("seq1", "ACTGACTGAC"), ("seq2", "GTCG")],
+        )
+
+    def test_mapped_reads(self):
+        with FASTAFile(source=self._path) as fasta:
+            self.assertIsNotNone(fasta._mmap)
+            self.assertEqual(fasta["seq1"][2:6], "TGAC")
+        self.assertTrue(fasta._mmap.closed)
+
+
+class TestBGZFCompressedIndexedFASTAIteration(SimpleFASTA):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
 
+        # the compressed fixtures are shared, so each file gets its own streams
+        compressed, index_compressed = _compress_bgzf(cls._source.encode("utf-8"))
         cls._file = FASTAFile(
-            source=compressed,
+            source=BytesIO(compressed),
             index=StringIO(cls._index),
-            index_compressed=index_compressed,
+            index_compressed=BytesIO(index_compressed),
         )
 
     def test_iterating(self):
@@ -278,13 +510,18 @@ class TestBGZFCompressedIndexedFASTAIteration(SimpleFASTA):
         self.assertEqual(records[1].id, "seq2")
         self.assertEqual(records[1].sequence, "GTCG")
 
+    def test_iter_headers(self):
+        records = list(self._file.iter_headers())
+        self.assertEqual([record.id for record in records], ["seq1", "seq2"])
+        self.assertEqual(records[1].sequence, "GTCG")
+
 
 class TestGZIPCompressedFASTAIteration(SimpleFASTA):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
 
-        compressed = BytesIO(zlib.compress(cls._source.encode("utf-8"), wbits=31))
+        compressed = BytesIO(_compress_gzip(cls._source.encode("utf-8")))
 
         cls._file = FASTAFile(source=compressed)
 
@@ -295,6 +532,23 @@ class TestGZIPCompressedFASTAIteration(SimpleFASTA):
         self.assertEqual(records[1].id, "seq2")
         self.assertEqual(records[1].sequence, "GTCG")
 
+    def test_iter_headers(self):
+        records = list(self._file.iter_headers())
+        self.assertEqual([record.id for record in records], ["seq1", "seq2"])
+
+    def test_iterating_across_reads(self):
+        read_size = fastah.fasta.INDEX_READ_SIZE
+        fastah.fasta.INDEX_READ_SIZE = 3
+        try:
+            records = list(self._file)
+        finally:
+            fastah.fasta.INDEX_READ_SIZE = read_size
+
+        self.assertEqual(
+            [(record.id, record.sequence) for record in records],
+            [("seq1", "ACTGACTGAC"), ("seq2", "GTCG")],
+        )
+
     def test_index(self):
         with self.assertRaises(RuntimeError):
             self._file["seq1"][:4]
@@ -305,7 +559,7 @@ class TestGZIPCompressedFAIIndexedFASTAIteration(SimpleFASTA):
     def setUpClass(cls):
         super().setUpClass()
 
-        compressed = BytesIO(zlib.compress(cls._source.encode("utf-8"), wbits=31))
+        compressed = BytesIO(_compress_gzip(cls._source.encode("utf-8")))
 
         cls._file = FASTAFile(source=compressed, index=StringIO(cls._index))
 
@@ -327,10 +581,9 @@ class TestZstdCompressedFAIIndexedFASTAIterating(SimpleFASTA):
     def setUpClass(cls):
         super().setUpClass()
 
-        compressor = zstandard.ZstdCompressor()
-        compressed = BytesIO(compressor.compress(cls._source.encode("utf-8")))
+        compressed, _ = _compress_zstd(cls._source.encode("utf-8"))
 
-        cls._file = FASTAFile(source=compressed, index=StringIO(cls._index))
+        cls._file = FASTAFile(source=BytesIO(compressed), index=StringIO(cls._index))
 
     def test_iterating(self):
         records = list(self._file)
@@ -350,18 +603,11 @@ class TestZStdCompressedIndexedFASTAParsing(SimpleFASTA):
     def setUpClass(cls):
         super().setUpClass()
 
-        compressor = zstandard.ZstdCompressor()
-
-        compressed = BytesIO(compressor.compress(cls._source.encode("utf-8")))
-        index_compressed = BytesIO(b"")
-        _zstd.index(compressed, index_compressed)
-        compressed.seek(0)
-        index_compressed.seek(0)
-
+        compressed, index_compressed = _compress_zstd(cls._source.encode("utf-8"))
         cls._file = FASTAFile(
-            source=compressed,
+            source=BytesIO(compressed),
             index=StringIO(cls._index),
-            index_compressed=index_compressed,
+            index_compressed=BytesIO(index_compressed),
         )
 
     def test_index_slice(self):